@@ -9,10 +9,12 @@
 import re
 import sys
 import json
+import functools
+import itertools
 import logging
+import shutil
 import subprocess
 import click
-from rich.logging import RichHandler
 
 # --- Logging Configuration ---
 
@@ -30,20 +32,36 @@ class JsonFormatter(logging.Formatter):
             log_record["exception"] = self.formatException(record.exc_info)
         return json.dumps(log_record)
 
+class PlainFormatter(logging.Formatter):
+    """Formatter for non-interactive stderr that drops Rich markup tags."""
+    _markup_re = re.compile(r'\[(?:/|[a-z][a-z ]*)\]')
+
+    def format(self, record):
+        message = super().format(record)
+        if getattr(record, "markup", False):
+            message = self._markup_re.sub('', message)
+        return message
+
 def setup_logging(verbose: bool, log_file: str):
-    """Sets up dual logging: Rich (console/stderr) and JSON (file)."""
+    """Sets up dual logging: Rich or plain text (console/stderr) and JSON (file)."""
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.DEBUG if verbose else logging.INFO)
 
-    # 1. Console Handler (Rich) - writes to stderr to allow piping stdout
-    console_handler = RichHandler(
-        rich_tracebacks=True, 
-        markup=True,
-        show_path=False,
-        console=click.get_current_context().find_root().obj # Use context if needed, or default
-    )
-    console_format = "%(message)s"
-    console_handler.setFormatter(logging.Formatter(console_format))
+    # 1. Console Handler - writes to stderr to allow piping stdout
+    if verbose or sys.stderr.isatty():
+        # Rich is only worth its import time when someone is watching
+        from rich.logging import RichHandler
+
+        console_handler = RichHandler(
+            rich_tracebacks=True, 
+            markup=True,
+            show_path=False,
+        )
+        console_format = "%(message)s"
+        console_handler.setFormatter(logging.Formatter(console_format))
+    else:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(PlainFormatter("%(levelname)-8s %(message)s"))
     root_logger.addHandler(console_handler)
 
     # 2. File Handler (JSON)
@@ -54,209 +72,309 @@ def setup_logging(verbose: bool, log_file: str):
 
 # --- Converter Logic ---
 
-def to_camel_case(snake_str):
-    components = snake_str.split('_')
-    return ''.join(x.title() for x in components)
-
-def map_type(proto_type):
-    type_mapping = {
-        'double': 'float64',
-        'float': 'float32',
-        'int32': 'int32',
-        'int64': 'int64',
-        'uint32': 'uint32',
-        'uint64': 'uint64',
-        'sint32': 'int32',
-        'sint64': 'int64',
-        'fixed32': 'uint32',
-        'fixed64': 'uint64',
-        'sfixed32': 'int32',
-        'sfixed64': 'int64',
-        'bool': 'bool',
-        'string': 'string',
-        'bytes': '[]byte',
-        # Well-known types mapping
-        'google.protobuf.Timestamp': 'time.Time',
-        'Timestamp': 'time.Time',
+# Shared `extra` for markup log calls in the parse loop; with lazy %-style
+# arguments nothing is formatted or allocated when the level is disabled
+_MARKUP_EXTRA = {"markup": True}
+
+@functools.lru_cache(maxsize=1)
+def _patterns():
+    """Compiles the block header patterns on first use and reuses them across conversions.
+
+    Returns a mapping of leading keyword to (parser state, header pattern).
+    """
+    return {
+        'message': (_MESSAGE, re.compile(r'message\s+(\w+)\s*\{')),
+        'service': (_SERVICE, re.compile(r'service\s+(\w+)\s*\{')),
+        'enum': (_ENUM, re.compile(r'enum\s+(\w+)\s*\{')),
     }
-    return type_mapping.get(proto_type, proto_type)
+
+# Field, enum value and rpc lines are simple enough to tokenize with str.partition/split
+
+def _is_field_number(tail):
+    """Checks that the text after '=' is a bare field number terminated by ';'."""
+    number, sep, _ = tail.partition(';')
+    return bool(sep) and number.strip().isdigit()
+
+def _parse_field_line(code_part):
+    """Parses `[repeated] type name = N;` into (is_repeated, proto_type, field_name)."""
+    head, _, tail = code_part.partition('=')
+    if not _is_field_number(tail):
+        return None
+    toks = head.split()
+    if len(toks) < 2:
+        return None
+    proto_type, field_name = toks[-2], toks[-1]
+    if not (proto_type.replace('.', '_').isidentifier() and field_name.isidentifier()):
+        return None
+    return len(toks) == 3 and toks[0] == 'repeated', proto_type, field_name
+
+def _parse_enum_value_line(code_part):
+    """Parses `NAME = N;` and returns the value name."""
+    head, _, tail = code_part.partition('=')
+    if not _is_field_number(tail):
+        return None
+    toks = head.split()
+    if not toks or not toks[-1].isidentifier():
+        return None
+    return toks[-1]
+
+def _parse_rpc_line(code_part):
+    """Parses `rpc Name(Req) returns (Resp)` into (method_name, req_type, resp_type)."""
+    if not code_part[3:4].isspace():
+        return None
+    method_name, _, rest = code_part[3:].partition('(')
+    req_type, _, rest = rest.partition(')')
+    keyword, _, rest = rest.partition('(')
+    resp_type, sep, _ = rest.partition(')')
+    method_name = method_name.strip()
+    if not sep or keyword.strip() != 'returns' or not method_name.isidentifier():
+        return None
+    req_type, resp_type = req_type.strip(), resp_type.strip()
+    if not req_type or not resp_type:
+        return None
+    return method_name, req_type, resp_type
+
+def to_camel_case(snake_str):
+    # '_' already starts a new word for str.title(), so one title() over the whole
+    # name matches titling each component without the split/join
+    return snake_str.title().replace('_', '')
+
+@functools.lru_cache(maxsize=512)
+def _go_field_name(field_name):
+    """Converts a proto field name to a Go field name, cached since names repeat across messages."""
+    go_field_name = to_camel_case(field_name)
+    if go_field_name.endswith("Id"):
+        go_field_name = go_field_name[:-2] + "ID"
+    return go_field_name
+
+# Scalar and well-known types; the parse loop looks these up inline
+_TYPE_MAP = {
+    'double': 'float64',
+    'float': 'float32',
+    'int32': 'int32',
+    'int64': 'int64',
+    'uint32': 'uint32',
+    'uint64': 'uint64',
+    'sint32': 'int32',
+    'sint64': 'int64',
+    'fixed32': 'uint32',
+    'fixed64': 'uint64',
+    'sfixed32': 'int32',
+    'sfixed64': 'int64',
+    'bool': 'bool',
+    'string': 'string',
+    'bytes': '[]byte',
+    # Well-known types mapping
+    'google.protobuf.Timestamp': 'time.Time',
+    'Timestamp': 'time.Time',
+}
+
+# Case-insensitive UUID hint in field comments, without upper-casing a copy
+_UUID_RE = re.compile(r'uuid', re.IGNORECASE)
+
+# Parser states; _NONE is falsy so "inside a block" is a plain truth test
+_NONE, _MESSAGE, _SERVICE, _ENUM = 0, 1, 2, 3
+
+# The generator can only emit a handful of imports, so track them as bit flags.
+# _IMPORT_TABLE is kept in sorted import order.
+_IMP_CONTEXT, _IMP_TIME, _IMP_UUID = 1, 2, 4
+_IMPORT_TABLE = (
+    (_IMP_CONTEXT, '"context"'),
+    (_IMP_UUID, '"github.com/google/uuid"'),
+    (_IMP_TIME, '"time"'),
+)
+
+@functools.lru_cache(maxsize=1)
+def _gofmt_path():
+    """Resolves the gofmt executable once instead of walking PATH on every call."""
+    return shutil.which("gofmt")
 
 def run_gofmt(code: str) -> str:
     """Formats Go code using gofmt via stdin/stdout without temp files."""
     logger = logging.getLogger("converter")
-    
+
+    # gofmt has no framing for multiple inputs, so it still runs once per call;
+    # the resolved path saves the PATH lookup.
+    gofmt = _gofmt_path()
+    if gofmt is None:
+        logger.warning("The 'gofmt' executable was not found in PATH. Skipping formatting.")
+        return code
+
     try:
         # Run gofmt, passing code to stdin
         process = subprocess.run(
-            ["gofmt"],
+            [gofmt],
             input=code.encode("utf-8"),
-            capture_output=True,
-            check=True
+            capture_output=True
         )
-        logger.info("Code formatted successfully with gofmt.")
-        return process.stdout.decode("utf-8")
-        
     except FileNotFoundError:
         logger.warning("The 'gofmt' executable was not found in PATH. Skipping formatting.")
         return code
-    except subprocess.CalledProcessError as e:
-        logger.error(f"gofmt failed to format code:\n{e.stderr.decode('utf-8')}")
+
+    if process.returncode != 0:
+        logger.error(f"gofmt failed to format code:\n{process.stderr.decode('utf-8')}")
         # Return original code if formatting fails, so the user doesn't lose output
         return code
 
+    logger.info("Code formatted successfully with gofmt.")
+    return process.stdout.decode("utf-8")
+
 def parse_proto_and_generate_go(input_file, package_name):
+    """Yields the generated Go source line by line, without trailing newlines."""
     logger = logging.getLogger("converter")
     logger.info(f"Starting conversion for file: [bold cyan]{input_file}[/]", extra={"markup": True})
 
-    try:
-        with open(input_file, 'r') as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        logger.critical(f"Input file not found: {input_file}")
-        sys.exit(1)
-
-    imports = {"\"context\""}
+    imports = _IMP_CONTEXT
     body_code = []
     
-    state = "NONE" # NONE, MESSAGE, SERVICE, ENUM
+    state = _NONE
     current_enum_name = ""
     is_first_enum_field = False
     
-    message_regex = re.compile(r'message\s+(\w+)\s*\{')
-    service_regex = re.compile(r'service\s+(\w+)\s*\{')
-    enum_regex = re.compile(r'enum\s+(\w+)\s*\{')
-    
-    # Regex fields
-    field_regex = re.compile(r'\s*(repeated)?\s*([\w\.]+)\s+(\w+)\s*=\s*\d+;')
-    rpc_regex = re.compile(r'\s*rpc\s+(\w+)\s*\(([^)]+)\)\s*returns\s*\(([^)]+)\)')
-    enum_field_regex = re.compile(r'\s*(\w+)\s*=\s*\d+;')
+    # Bind the module-level patterns and tables to locals for the hot loop below
+    block_headers = _patterns()
+    type_map = _TYPE_MAP
+    uuid_search = _UUID_RE.search
     
     line_count = 0
 
-    for line in lines:
-        line_count += 1
-        raw_line = line.strip()
+    try:
+        # Protos are UTF-8 by spec; newline='' skips newline translation since
+        # every line is stripped anyway
+        f = open(input_file, 'r', encoding='utf-8', newline='')
+    except FileNotFoundError:
+        logger.critical(f"Input file not found: {input_file}")
+        sys.exit(1)
+
+    # Stream the file line by line instead of materializing it with readlines()
+    with f:
+        for line_count, line in enumerate(f, 1):
+            raw_line = line.strip()
         
-        if not raw_line or raw_line.startswith('//'):
-            continue
-
-        parts = raw_line.split('//', 1)
-        code_part = parts[0].strip()
-        comment_part = parts[1].strip() if len(parts) > 1 else ""
-
-        if not code_part:
-            continue
-
-        # Detect Message
-        msg_match = message_regex.search(code_part)
-        if msg_match:
-            struct_name = msg_match.group(1)
-            logger.debug(f"Found message definition: [green]{struct_name}[/]", extra={"markup": True})
-            body_code.append(f"// {struct_name} represents the {struct_name} model from proto")
-            body_code.append(f"type {struct_name} struct {{")
-            state = "MESSAGE"
-            continue
-
-        # Detect Enum
-        enum_match = enum_regex.search(code_part)
-        if enum_match:
-            current_enum_name = enum_match.group(1)
-            logger.debug(f"Found enum definition: [yellow]{current_enum_name}[/]", extra={"markup": True})
-            body_code.append(f"// {current_enum_name} is an enumeration based on byte")
-            body_code.append(f"type {current_enum_name} byte")
-            body_code.append("const (")
-            state = "ENUM"
-            is_first_enum_field = True
-            continue
-
-        # Detect Service
-        svc_match = service_regex.search(code_part)
-        if svc_match:
-            service_name = svc_match.group(1)
-            logger.info(f"Found service definition: [blue]{service_name}[/]", extra={"markup": True})
-            body_code.append(f"// {service_name} defines the interface for the REST client/server")
-            body_code.append(f"type {service_name} interface {{")
-            state = "SERVICE"
-            continue
-
-        # Detect End Block
-        if code_part == '}' and state in ["MESSAGE", "SERVICE", "ENUM"]:
-            if state == "ENUM":
-                body_code.append(")") # Close const block
-            else:
-                body_code.append("}") # Close struct/interface
+            if not raw_line or raw_line.startswith('//'):
+                continue
+
+            # raw_line is already stripped and does not start with '//', so code_part
+            # only needs trimming on the right and is never empty
+            code_part, sep, comment_part = raw_line.partition('//')
+            if sep:
+                code_part = code_part.rstrip()
+
+            # Classify the line by its leading keyword with a single lookup
+            keyword = code_part.split(None, 1)[0]
+
+            # Detect Message, Enum or Service
+            block_header = block_headers.get(keyword)
+            if block_header is not None:
+                block_state, header_regex = block_header
+                header_match = header_regex.match(code_part)
+                if header_match:
+                    block_name = header_match.group(1)
+                    if block_state == _MESSAGE:
+                        logger.debug("Found message definition: [green]%s[/]", block_name, extra=_MARKUP_EXTRA)
+                        body_code.append(f"// {block_name} represents the {block_name} model from proto")
+                        body_code.append(f"type {block_name} struct {{")
+                    elif block_state == _ENUM:
+                        current_enum_name = block_name
+                        logger.debug("Found enum definition: [yellow]%s[/]", current_enum_name, extra=_MARKUP_EXTRA)
+                        body_code.append(f"// {current_enum_name} is an enumeration based on byte")
+                        body_code.append(f"type {current_enum_name} byte")
+                        body_code.append("const (")
+                        is_first_enum_field = True
+                    else:
+                        logger.info("Found service definition: [blue]%s[/]", block_name, extra=_MARKUP_EXTRA)
+                        body_code.append(f"// {block_name} defines the interface for the REST client/server")
+                        body_code.append(f"type {block_name} interface {{")
+                    state = block_state
+                    continue
+
+            # Top-level statements (syntax, package, import, option) emit nothing
+            if not state:
+                continue
+
+            # Detect End Block
+            # state is non-zero here, so every '}' closes the current block
+            if code_part == '}':
+                if state == _ENUM:
+                    body_code.append(")") # Close const block
+                else:
+                    body_code.append("}") # Close struct/interface
             
-            body_code.append("")
-            state = "NONE"
-            continue
-
-        # Process Message Fields
-        if state == "MESSAGE":
-            field_match = field_regex.search(code_part)
-            if field_match:
-                is_repeated = field_match.group(1) == 'repeated'
-                proto_type = field_match.group(2)
-                field_name = field_match.group(3)
+                body_code.append("")
+                state = _NONE
+                continue
+
+            # Process Message Fields
+            if state == _MESSAGE:
+                field_match = _parse_field_line(code_part) if '=' in code_part else None
+                if field_match:
+                    is_repeated, proto_type, field_name = field_match
                 
-                go_type = map_type(proto_type)
+                    go_type = type_map.get(proto_type, proto_type)
                 
-                # Handle imports for known types
-                if go_type == "time.Time":
-                    imports.add("\"time\"")
+                    # Handle imports for known types
+                    if go_type == "time.Time":
+                        imports |= _IMP_TIME
                 
-                # Check for UUID hint
-                if "UUID" in comment_part.upper():
-                    logger.debug(f"Detected UUID field: {field_name} in struct")
-                    go_type = "uuid.UUID"
-                    imports.add("\"github.com/google/uuid\"")
+                    # Check for UUID hint
+                    if comment_part and uuid_search(comment_part):
+                        logger.debug("Detected UUID field: %s in struct", field_name)
+                        go_type = "uuid.UUID"
+                        imports |= _IMP_UUID
                 
-                if is_repeated:
-                    go_type = f"[]{go_type}"
+                    if is_repeated:
+                        go_type = f"[]{go_type}"
                 
-                go_field_name = to_camel_case(field_name)
-                if go_field_name.endswith("Id"):
-                    go_field_name = go_field_name[:-2] + "ID"
+                    go_field_name = _go_field_name(field_name)
                 
-                body_code.append(f"\t{go_field_name} {go_type} `json:\"{field_name},omitempty\"`")
-                continue
+                    body_code.append(''.join(('\t', go_field_name, ' ', go_type, ' `json:"', field_name, ',omitempty"`')))
+                    continue
 
-        # Process Enum Values (Constants)
-        if state == "ENUM":
-            enum_field_match = enum_field_regex.search(code_part)
-            if enum_field_match:
-                val_name = enum_field_match.group(1)
+            # Process Enum Values (Constants)
+            if state == _ENUM:
+                val_name = _parse_enum_value_line(code_part) if '=' in code_part else None
+                if val_name:
                 
-                if is_first_enum_field:
-                    body_code.append(f"\t{val_name} {current_enum_name} = iota")
-                    is_first_enum_field = False
-                else:
-                    body_code.append(f"\t{val_name}")
-                continue
+                    if is_first_enum_field:
+                        body_code.append(f"\t{val_name} {current_enum_name} = iota")
+                        is_first_enum_field = False
+                    else:
+                        body_code.append(f"\t{val_name}")
+                    continue
 
-        # Process RPC
-        if state == "SERVICE":
-            rpc_match = rpc_regex.search(code_part)
-            if rpc_match:
-                method_name = rpc_match.group(1)
-                req_type = rpc_match.group(2).replace("stream ", "")
-                resp_type = rpc_match.group(3).replace("stream ", "")
+            # Process RPC
+            if state == _SERVICE:
+                rpc_match = _parse_rpc_line(code_part) if keyword == 'rpc' else None
+                if rpc_match:
+                    method_name, req_type, resp_type = rpc_match
+                    req_type = req_type.replace("stream ", "")
+                    resp_type = resp_type.replace("stream ", "")
                 
-                logger.debug(f"Processing RPC: {method_name}")
-                body_code.append(f"\t{method_name}(ctx context.Context, req *{req_type}) (*{resp_type}, error)")
-                continue
+                    logger.debug("Processing RPC: %s", method_name)
+                    body_code.append(''.join(('\t', method_name, '(ctx context.Context, req *', req_type, ') (*', resp_type, ', error)')))
+                    continue
 
     logger.info(f"Parsed {line_count} lines. Generating Go code...")
 
-    go_code = [f"package {package_name}", ""]
+    # The import block depends on the whole file, so only the body is buffered
+    yield f"package {package_name}"
+    yield ""
     if imports:
-        go_code.append("import (")
-        for imp in sorted(imports):
-            go_code.append(f"\t{imp}")
-        go_code.append(")")
-        go_code.append("")
-    go_code.extend(body_code)
-    
-    return "\n".join(go_code)
+        yield "import ("
+        for bit, imp in _IMPORT_TABLE:
+            if imports & bit:
+                yield f"\t{imp}"
+        yield ")"
+        yield ""
+    yield from body_code
+
+def write_lines(stream, lines):
+    """Writes lines to stream joined by newlines, without building the full text."""
+    lines = iter(lines)
+    stream.write(next(lines, ""))
+    for line in lines:
+        stream.write("\n")
+        stream.write(line)
 
 # --- CLI Entry Point ---
 
@@ -277,18 +395,24 @@ def main(input_proto, package, output, verbose, should_format, log_file):
     logger = logging.getLogger("main")
 
     try:
-        go_code = parse_proto_and_generate_go(input_proto, package)
+        go_lines = parse_proto_and_generate_go(input_proto, package)
+        # The whole parse runs before the first yield. Pull that line now, so
+        # parse errors, or an output path that is also the input, cannot
+        # truncate the output before it is read.
+        go_lines = itertools.chain((next(go_lines),), go_lines)
         
         if should_format:
-            go_code = run_gofmt(go_code)
+            # gofmt needs the whole source at once
+            go_lines = [run_gofmt("\n".join(go_lines))]
         
         if output:
             with open(output, 'w') as f:
-                f.write(go_code)
+                write_lines(f, go_lines)
             logger.info(f"Successfully wrote generated code to: [bold green]{output}[/]", extra={"markup": True})
         else:
             # Print to stdout for piping. 
-            print(go_code)
+            write_lines(sys.stdout, go_lines)
+            sys.stdout.write("\n")
             logger.info("Output sent to stdout")
 
     except Exception as e: